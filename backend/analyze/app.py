@@ -1,3 +1,4 @@
+import functools
 import json
 import os
 from google import genai
@@ -5,9 +6,15 @@ from services.common import fetch_tmdb_context
 from services.score import analyze_score
 from services.synopsis import analyze_synopsis
 from services.composition import analyze_composition
+from services.jobs import load_job_backend, process_job, wait_for_job
+from services.telemetry import TELEMETRY
 
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 
+# Modes slow enough to be worth running as background jobs
+ASYNC_MODES = ('synopsis', 'composition')
+MAX_WAIT_SECONDS = 25
+
 # Safety Config (Global)
 SAFETY_CONFIG = [
     {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_ONLY_HIGH"},
@@ -16,8 +23,29 @@ SAFETY_CONFIG = [
     {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_ONLY_HIGH"}
 ]
 
+@functools.lru_cache(maxsize=None)
+def get_job_backend():
+    """
+    Job store/queue picked by JOB_BACKEND (see services.jobs.load_job_backend).
+    None means async mode is disabled.
+    """
+    return load_job_backend(run_job)
+
 def lambda_handler(event, context):
+    # ASYNC WORKER: jobs delivered from the SQS job queue
+    if event.get('Records'):
+        return process_job_records(event)
+
     query_params = event.get('queryStringParameters') or {}
+
+    # ASYNC: poll an existing job
+    if query_params.get('job'):
+        return poll_job(query_params.get('job'), query_params.get('wait'))
+
+    # ASYNC: submit a new job
+    if str(query_params.get('async', '')).lower() in ('1', 'true'):
+        return submit_job(query_params)
+
     movie_title = query_params.get('title')
     movie_id = query_params.get('id')
     media_type = query_params.get('type', 'movie')
@@ -51,6 +79,93 @@ def lambda_handler(event, context):
 
     except Exception as e:
         return build_response(500, {"error": str(e)})
+    finally:
+        # 4. EMIT TELEMETRY (EMF lines -> CloudWatch metrics)
+        TELEMETRY.flush()
+
+def submit_job(query_params):
+    mode = query_params.get('mode', 'score')
+    if mode not in ASYNC_MODES:
+        return build_response(400, {"error": "Async not supported for this mode"})
+    if not query_params.get('id') and not query_params.get('title'):
+        return build_response(400, {"error": "Please provide a title or id"})
+
+    params = {
+        "id": query_params.get('id'),
+        "title": query_params.get('title'),
+        "type": query_params.get('type', 'movie'),
+        "mode": mode,
+        "season": query_params.get('season'),
+    }
+
+    try:
+        backend = get_job_backend()
+        if not backend:
+            return build_response(400, {"error": "Async mode not enabled"})
+        job, created = backend.store.submit(params)
+        if created:
+            backend.queue.enqueue(job)
+        return build_response(202, {"job_id": job['job_id'], "status": job['status']})
+    except Exception as e:
+        return build_response(500, {"error": str(e)})
+
+def poll_job(job_id, wait_query):
+    try:
+        wait = min(max(float(wait_query or 0), 0), MAX_WAIT_SECONDS)
+    except ValueError:
+        wait = 0
+
+    try:
+        backend = get_job_backend()
+        if not backend:
+            return build_response(400, {"error": "Async mode not enabled"})
+        job = wait_for_job(backend.store, job_id, timeout=wait)
+    except Exception as e:
+        return build_response(500, {"error": str(e)})
+
+    if not job:
+        return build_response(404, {"error": "Job not found"})
+
+    body = {"job_id": job['job_id'], "status": job['status']}
+    if job['result'] is not None:
+        body['result'] = job['result']
+    if job['error']:
+        body['error'] = job['error']
+    return build_response(200, body)
+
+def process_job_records(event):
+    # Bad config or bad messages are logged and dropped: raising would only make SQS redeliver them
+    backend = get_job_backend()
+    if not backend:
+        print("Job Record Error: async mode not enabled")
+        return {}
+
+    for record in event['Records']:
+        try:
+            job_id = json.loads(record['body'])['job_id']
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Job Record Error: malformed record ({e!r}): {record.get('body')!r}")
+            continue
+        process_job(backend.store, run_job, job_id)
+    return {}
+
+def run_job(params):
+    """
+    Background worker: same pipeline as the sync path, for ASYNC_MODES only.
+    """
+    ctx = fetch_tmdb_context(params['id'], params['title'], params['type'])
+    if not ctx:
+        raise ValueError("Subject not found")
+    if not GEMINI_API_KEY:
+        raise RuntimeError("Server Configuration Error")
+
+    client = genai.Client(api_key=GEMINI_API_KEY)
+    try:
+        if params['mode'] == 'synopsis':
+            return analyze_synopsis(client, ctx, params['season'], SAFETY_CONFIG)
+        return analyze_composition(client, ctx, SAFETY_CONFIG)
+    finally:
+        TELEMETRY.flush()
 
 def build_response(status_code, body):
     return {
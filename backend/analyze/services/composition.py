@@ -1,5 +1,8 @@
 import json
 from google.genai import types
+from services.telemetry import track_call
+
+MODEL = "gemini-2.5-flash"
 
 def analyze_composition(client, context, safety_config):
     name = context['name']
@@ -48,15 +51,17 @@ def analyze_composition(client, context, safety_config):
             "technical": {{ "cinematography": Int, "score": Int, "performance": Int, "immersion": Int }}
         }}
         """
-        response = client.models.generate_content(
-            model="gemini-2.5-flash", 
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                safety_settings=safety_config
-            )
-        )
-        if response.text:
-            composition_data = json.loads(response.text.replace('```json', '').replace('```', '').strip())
+        with track_call('composition', MODEL) as call:
+            response = call.observe(client.models.generate_content(
+                model=MODEL, 
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    safety_settings=safety_config
+                )
+            ))
+            if response.text:
+                composition_data = json.loads(response.text.replace('```json', '').replace('```', '').strip())
+                call.parsed = True
     except Exception as e:
         print(f"Composition Error: {e}")
         
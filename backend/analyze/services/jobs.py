@@ -0,0 +1,424 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+try:
+    import boto3
+    from boto3.dynamodb.conditions import Attr
+    from botocore.exceptions import ClientError
+except ImportError:  # Only needed by the AWS backend (bundled in the Lambda runtime)
+    boto3 = None
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+# ~2x the analyze function timeout: an active job untouched for longer has lost its worker
+DEFAULT_STALE_SECONDS = 240
+# Between the function timeout (120s) and the SQS visibility timeout (180s):
+# a running job older than this was left behind by a killed worker and may be re-claimed
+DEFAULT_LEASE_SECONDS = 150
+# Worker runs per job before it is failed as expired
+DEFAULT_MAX_ATTEMPTS = 2
+EXPIRED_ERROR = "Job expired"
+
+JobBackend = namedtuple('JobBackend', ['store', 'queue'])
+
+
+def job_key(params):
+    """
+    Stable fingerprint of an analyze request.
+    Identical requests share a key so pending work can be deduplicated.
+    """
+    raw = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class JobStore(ABC):
+    """
+    Storage interface for async analyze jobs.
+    Implementations must make submit() atomic so two identical requests
+    never create two live jobs, and must treat stale active jobs as failed.
+    """
+
+    def __init__(self, stale_after=DEFAULT_STALE_SECONDS, lease=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.stale_after = stale_after
+        self.lease = lease
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def submit(self, params):
+        """Returns (job, created). Reuses a live job with the same key."""
+
+    @abstractmethod
+    def get(self, job_id):
+        """Returns the job dict, or None if unknown."""
+
+    @abstractmethod
+    def claim(self, job_id):
+        """
+        Atomically moves a job to running and counts the attempt.
+        Succeeds for a pending job, or a running job whose lease ran out,
+        while attempts < max_attempts. Returns False if another worker owns it.
+        """
+
+    @abstractmethod
+    def complete(self, job_id, result):
+        pass
+
+    @abstractmethod
+    def fail(self, job_id, error):
+        pass
+
+    def is_stale(self, job, now=None):
+        now = time.time() if now is None else now
+        return job['status'] in ACTIVE_STATUSES and now - job['updated_at'] > self.stale_after
+
+    def is_abandoned(self, job, now=None):
+        """A running job past its lease with no attempts left: nobody will finish it."""
+        now = time.time() if now is None else now
+        return (job['status'] == STATUS_RUNNING and job['attempts'] >= self.max_attempts
+                and now - job['updated_at'] >= self.lease)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Local job store for tests and `sam local`.
+    Not shared between Lambda containers, so never the deployed backend.
+    """
+
+    def __init__(self, path=':memory:', **options):
+        super().__init__(**options)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                job_key TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        columns = [row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if 'attempts' not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs (job_key, status)")
+
+    def submit(self, params):
+        key = job_key(params)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT * FROM jobs WHERE job_key = ? AND status IN (?, ?) ORDER BY created_at",
+                    (key, *ACTIVE_STATUSES)
+                ).fetchall()
+                for row in rows:
+                    job = self._to_job(row)
+                    if not self.is_stale(job, now):
+                        self._conn.execute("COMMIT")
+                        return job, False
+                    # Orphaned by a dead worker: retire it so a fresh job can run
+                    self._set(job['job_id'], STATUS_FAILED, error=EXPIRED_ERROR)
+
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO jobs (id, job_key, params, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, key, json.dumps(params), STATUS_PENDING, now, now)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(job_id), True
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if not row:
+                return None
+            job = self._to_job(row)
+            if self.is_stale(job):
+                self._set(job_id, STATUS_FAILED, error=EXPIRED_ERROR)
+                job = self._to_job(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+        return job
+
+    def claim(self, job_id):
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ? AND attempts < ?
+                  AND (status = ? OR (status = ? AND updated_at <= ?))
+                """,
+                (STATUS_RUNNING, now, job_id, self.max_attempts, STATUS_PENDING, STATUS_RUNNING, now - self.lease)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, result):
+        self._update(job_id, STATUS_DONE, result=json.dumps(result))
+
+    def fail(self, job_id, error):
+        self._update(job_id, STATUS_FAILED, error=str(error))
+
+    def _update(self, job_id, status, result=None, error=None):
+        with self._lock:
+            self._set(job_id, status, result, error)
+
+    def _set(self, job_id, status, result=None, error=None):
+        # Caller holds self._lock
+        self._conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, result, error, time.time(), job_id)
+        )
+
+    def _to_job(self, row):
+        return {
+            "job_id": row['id'],
+            "status": row['status'],
+            "params": json.loads(row['params']),
+            "result": json.loads(row['result']) if row['result'] else None,
+            "error": row['error'],
+            "attempts": row['attempts'],
+            "updated_at": row['updated_at'],
+        }
+
+
+class DynamoDBJobStore(JobStore):
+    """
+    Shared job store for the deployed stack.
+    Jobs live under `job#<id>`; `key#<job_key>` points at the current job
+    for a request and is swapped with a conditional write to deduplicate.
+    Items carry `expires_at` for DynamoDB TTL cleanup.
+    """
+
+    def __init__(self, table_name, ttl=86400, table=None, **options):
+        super().__init__(**options)
+        if table is None:
+            table = boto3.resource('dynamodb').Table(table_name)
+        self.table = table
+        self.ttl = ttl
+
+    def submit(self, params):
+        key = job_key(params)
+        pointer = self._get_item(f"key#{key}")
+        if pointer:
+            # get() retires stale jobs, so an active job here has a live worker
+            current = self.get(pointer['job_id'])
+            if current and current['status'] in ACTIVE_STATUSES:
+                return current, False
+
+        now = int(time.time())
+        job_id = uuid.uuid4().hex
+        item = {
+            "pk": f"job#{job_id}",
+            "job_id": job_id,
+            "params": json.dumps(params),
+            "status": STATUS_PENDING,
+            "attempts": 0,
+            "updated_at": now,
+            "expires_at": now + self.ttl,
+        }
+        self.table.put_item(Item=item)
+
+        condition = Attr('job_id').eq(pointer['job_id']) if pointer else Attr('pk').not_exists()
+        try:
+            self.table.put_item(
+                Item={"pk": f"key#{key}", "job_id": job_id, "expires_at": now + self.ttl},
+                ConditionExpression=condition
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # Lost the race to an identical request: drop ours, follow the winner
+            self.table.delete_item(Key={"pk": f"job#{job_id}"})
+            winner = self._get_item(f"key#{key}")
+            return self.get(winner['job_id']), False
+
+        return self._to_job(item), True
+
+    def get(self, job_id):
+        item = self._get_item(f"job#{job_id}")
+        if not item:
+            return None
+        job = self._to_job(item)
+        if self.is_stale(job):
+            self.fail(job_id, EXPIRED_ERROR)
+            job = self._to_job(self._get_item(f"job#{job_id}"))
+        return job
+
+    def claim(self, job_id):
+        now = int(time.time())
+        try:
+            self.table.update_item(
+                Key={"pk": f"job#{job_id}"},
+                UpdateExpression="SET #status = :running, updated_at = :now ADD attempts :one",
+                ConditionExpression=(
+                    "attribute_exists(pk) AND (attribute_not_exists(attempts) OR attempts < :max) "
+                    "AND (#status = :pending OR (#status = :running AND updated_at <= :lease_cutoff))"
+                ),
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={
+                    ":running": STATUS_RUNNING, ":pending": STATUS_PENDING, ":now": now, ":one": 1,
+                    ":max": self.max_attempts, ":lease_cutoff": now - self.lease,
+                }
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        return True
+
+    def complete(self, job_id, result):
+        self._update(job_id, STATUS_DONE, result=json.dumps(result))
+
+    def fail(self, job_id, error):
+        self._update(job_id, STATUS_FAILED, error=str(error))
+
+    def _get_item(self, pk):
+        return self.table.get_item(Key={"pk": pk}, ConsistentRead=True).get('Item')
+
+    def _update(self, job_id, status, result=None, error=None):
+        self.table.update_item(
+            Key={"pk": f"job#{job_id}"},
+            UpdateExpression="SET #status = :status, #result = :result, #error = :error, updated_at = :now",
+            ExpressionAttributeNames={"#status": "status", "#result": "result", "#error": "error"},
+            ExpressionAttributeValues={":status": status, ":result": result, ":error": error, ":now": int(time.time())}
+        )
+
+    def _to_job(self, item):
+        return {
+            "job_id": item['job_id'],
+            "status": item['status'],
+            "params": json.loads(item['params']),
+            "result": json.loads(item['result']) if item.get('result') else None,
+            "error": item.get('error'),
+            "attempts": int(item.get('attempts', 0)),
+            "updated_at": int(item['updated_at']),
+        }
+
+
+class JobQueue(ABC):
+    """Hands a stored job to whatever runs the worker."""
+
+    @abstractmethod
+    def enqueue(self, job):
+        pass
+
+
+class ThreadJobQueue(JobQueue):
+    """
+    Runs jobs on background threads in the current process.
+    Local only: Lambda freezes these threads once the handler returns.
+    """
+
+    def __init__(self, store, runner):
+        self.store = store
+        self.runner = runner
+
+    def enqueue(self, job):
+        worker = threading.Thread(target=process_job, args=(self.store, self.runner, job['job_id']), daemon=True)
+        worker.start()
+        return worker
+
+
+class SQSJobQueue(JobQueue):
+    """
+    Sends job ids to SQS; the analyze function consumes the queue
+    and runs each job via process_job().
+    """
+
+    def __init__(self, queue_url, client=None):
+        self.queue_url = queue_url
+        self.client = client or boto3.client('sqs')
+
+    def enqueue(self, job):
+        return self.client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps({"job_id": job['job_id']}))
+
+
+def process_job(store, runner, job_id):
+    """
+    Worker body shared by every queue.
+    runner(params) returns the result dict that is stored on the job.
+    Jobs that already finished (or expired), or that another worker holds,
+    are skipped, so duplicate and repeated deliveries are safe.
+    """
+    job = store.get(job_id)
+    if not job or job['status'] not in ACTIVE_STATUSES:
+        return job
+
+    if not store.claim(job_id):
+        # Out of attempts after killed workers (e.g. function timeouts): stop retrying
+        if store.is_abandoned(job):
+            store.fail(job_id, EXPIRED_ERROR)
+        return store.get(job_id)
+
+    try:
+        store.complete(job_id, runner(job['params']))
+    except Exception as e:
+        print(f"Job Error: {e}")
+        store.fail(job_id, e)
+    return store.get(job_id)
+
+
+def load_job_backend(runner, environ=None):
+    """
+    Builds the job backend named by JOB_BACKEND.
+    Returns None when async mode is disabled (the default).
+    - sqlite:   SQLiteJobStore(JOB_STORE_PATH) + ThreadJobQueue (local only)
+    - dynamodb: DynamoDBJobStore(JOB_TABLE) + SQSJobQueue(JOB_QUEUE_URL)
+    JOB_STALE_SECONDS, JOB_LEASE_SECONDS and JOB_MAX_ATTEMPTS tune expiry and retries.
+    """
+    environ = os.environ if environ is None else environ
+    backend = environ.get('JOB_BACKEND', '').lower()
+    options = {
+        "stale_after": int(environ.get('JOB_STALE_SECONDS', DEFAULT_STALE_SECONDS)),
+        "lease": int(environ.get('JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)),
+        "max_attempts": int(environ.get('JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)),
+    }
+
+    if not backend:
+        return None
+
+    if backend == 'sqlite':
+        store = SQLiteJobStore(environ.get('JOB_STORE_PATH', '/tmp/mel_jobs.db'), **options)
+        return JobBackend(store, ThreadJobQueue(store, runner))
+
+    if backend == 'dynamodb':
+        if not environ.get('JOB_TABLE') or not environ.get('JOB_QUEUE_URL'):
+            raise ValueError("JOB_TABLE and JOB_QUEUE_URL are required for the dynamodb job backend")
+        store = DynamoDBJobStore(environ['JOB_TABLE'], **options)
+        return JobBackend(store, SQSJobQueue(environ['JOB_QUEUE_URL']))
+
+    raise ValueError(f"Unknown JOB_BACKEND: {backend}")
+
+
+def wait_for_job(store, job_id, timeout=0, interval=0.5):
+    """
+    Long-poll helper. Returns the job once it leaves an active state,
+    or its current snapshot when the timeout runs out.
+    """
+    deadline = time.monotonic() + timeout
+    job = store.get(job_id)
+    while job and job['status'] in ACTIVE_STATUSES and time.monotonic() < deadline:
+        time.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+        job = store.get(job_id)
+    return job
@@ -1,6 +1,9 @@
 import json
 from google import genai
 from google.genai import types
+from services.telemetry import track_call
+
+MODEL = "gemini-2.5-flash"
 
 def analyze_score(client, context, safety_config):
     name = context['name']
@@ -15,16 +18,18 @@ def analyze_score(client, context, safety_config):
         TASK: Use Google Search for "{specific_search_query}". Extract ONLY the Popcornmeter score percentage.
         JSON Schema: {{ "popcorn_score": "String (e.g. 95% or N/A)" }}
         """
-        response = client.models.generate_content(
-            model="gemini-2.5-flash", 
-            contents=prompt, 
-            config=types.GenerateContentConfig(
-                tools=[grounding_tool],
-                safety_settings=safety_config
-            )
-        )
-        if response.text:
-            lab_data = json.loads(response.text.replace('```json', '').replace('```', '').strip())
+        with track_call('score', MODEL) as call:
+            response = call.observe(client.models.generate_content(
+                model=MODEL, 
+                contents=prompt, 
+                config=types.GenerateContentConfig(
+                    tools=[grounding_tool],
+                    safety_settings=safety_config
+                )
+            ))
+            if response.text:
+                lab_data = json.loads(response.text.replace('```json', '').replace('```', '').strip())
+                call.parsed = True
     except Exception as e:
         print(f"Score Error: {e}")
         
@@ -1,5 +1,8 @@
 import json
 from google.genai import types
+from services.telemetry import track_call
+
+MODEL = "gemini-2.5-flash"
 
 def analyze_synopsis(client, context, season_query, safety_config):
     name = context['name']
@@ -63,17 +66,19 @@ def analyze_synopsis(client, context, season_query, safety_config):
         JSON Schema: {{ "full_plot": "String", "detailed_ending": "String" }}
         """
 
-        response = client.models.generate_content(
-            model="gemini-2.5-flash", 
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                safety_settings=safety_config
-            )
-        )
-        
-        if response.text:
-            cleaned_text = response.text.replace('```json', '').replace('```', '').strip()
-            synopsis_data = json.loads(cleaned_text)
+        with track_call('synopsis', MODEL) as call:
+            response = call.observe(client.models.generate_content(
+                model=MODEL, 
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    safety_settings=safety_config
+                )
+            ))
+            
+            if response.text:
+                cleaned_text = response.text.replace('```json', '').replace('```', '').strip()
+                synopsis_data = json.loads(cleaned_text)
+                call.parsed = True
             
     except Exception as e:
         print(f"Synopsis Error: {e}")
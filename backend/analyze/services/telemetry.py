@@ -0,0 +1,296 @@
+import argparse
+import json
+import sys
+import threading
+import time
+
+NAMESPACE = 'MEL/Analyze'
+
+# EMF allows at most 100 values per metric member
+MAX_EMF_VALUES = 100
+
+# Per-call distributions (metric name -> CloudWatch unit)
+DISTRIBUTIONS = {
+    "Latency": "Milliseconds",
+    "PromptTokens": "Count",
+    "ToolPromptTokens": "Count",
+    "OutputTokens": "Count",
+    "ThoughtsTokens": "Count",
+}
+
+# Per-flush totals
+COUNTERS = {
+    "Calls": "Count",
+    "Errors": "Count",
+    "ParseFailures": "Count",
+    "GroundedCalls": "Count",
+    "CacheHits": "Count",
+}
+
+METRICS = {**DISTRIBUTIONS, **COUNTERS}
+
+# Finish reasons meaning Gemini refused to answer
+BLOCKED_FINISH_REASONS = ('SAFETY', 'BLOCKLIST', 'PROHIBITED_CONTENT', 'SPII', 'RECITATION')
+
+
+class Telemetry:
+    """
+    In-process aggregator for Gemini calls.
+    Distributions are kept as histograms ({value: count}) and counters as
+    totals per (mode, model). flush() emits CloudWatch Embedded Metric
+    Format lines, expanding histograms into value arrays of <= 100 entries.
+    """
+
+    def __init__(self, namespace=NAMESPACE, emit=print):
+        self.namespace = namespace
+        self.emit = emit
+        self._lock = threading.Lock()
+        self._aggregates = {}
+
+    def record(self, mode, model, latency_ms, prompt_tokens=0, output_tokens=0,
+               thoughts_tokens=0, tool_prompt_tokens=0, responded=True, error=False,
+               parsed=False, grounded=False, cache_hit=False):
+        distributions = {"Latency": round(latency_ms)}
+        # No response means no usage metadata: a 0 would skew the token distributions
+        if responded:
+            distributions.update({
+                "PromptTokens": prompt_tokens,
+                "ToolPromptTokens": tool_prompt_tokens,
+                "OutputTokens": output_tokens,
+                "ThoughtsTokens": thoughts_tokens,
+            })
+        counters = {
+            "Calls": 1,
+            "Errors": 1 if error else 0,
+            # Only a response that arrived can fail to parse
+            "ParseFailures": 0 if error or parsed else 1,
+            "GroundedCalls": 1 if grounded else 0,
+            "CacheHits": 1 if cache_hit else 0,
+        }
+        with self._lock:
+            histograms, totals = self._aggregates.setdefault(
+                (mode, model), ({name: {} for name in DISTRIBUTIONS}, dict.fromkeys(COUNTERS, 0))
+            )
+            for name, value in distributions.items():
+                histograms[name][value] = histograms[name].get(value, 0) + 1
+            for name, value in counters.items():
+                totals[name] += value
+
+    def flush(self):
+        with self._lock:
+            aggregates, self._aggregates = self._aggregates, {}
+
+        timestamp = int(time.time() * 1000)
+        for (mode, model), (histograms, totals) in aggregates.items():
+            values = {
+                name: [value for value, count in sorted(histogram.items()) for _ in range(count)]
+                for name, histogram in histograms.items()
+            }
+            for start in range(0, totals['Calls'], MAX_EMF_VALUES):
+                members = {
+                    name: values[name][start:start + MAX_EMF_VALUES]
+                    for name in DISTRIBUTIONS if values[name][start:start + MAX_EMF_VALUES]
+                }
+                # Totals only on the first line: extra 0 datapoints would skew Average/SampleCount
+                if start == 0:
+                    members.update(totals)
+
+                line = {
+                    "_aws": {
+                        "Timestamp": timestamp,
+                        "CloudWatchMetrics": [{
+                            "Namespace": self.namespace,
+                            "Dimensions": [["Mode"]],
+                            "Metrics": [{"Name": name, "Unit": METRICS[name]} for name in members],
+                        }],
+                    },
+                    "Mode": mode,
+                    "Model": model,
+                    **members,
+                }
+                self.emit(json.dumps(line, separators=(',', ':')))
+
+
+class GeminiCall:
+    """
+    Collects metadata for a single generate_content call.
+    Use via track_call(); set `parsed = True` once the response JSON loads.
+    """
+
+    def __init__(self, mode, model):
+        self.mode = mode
+        self.model = model
+        self.responded = False
+        self.blocked = False
+        self.parsed = False
+        self.prompt_tokens = 0
+        self.tool_prompt_tokens = 0
+        self.output_tokens = 0
+        self.thoughts_tokens = 0
+        self.grounded = False
+        self.cache_hit = False
+
+    def observe(self, response):
+        self.responded = True
+
+        usage = getattr(response, 'usage_metadata', None)
+        if usage:
+            self.prompt_tokens = usage.prompt_token_count or 0
+            self.tool_prompt_tokens = usage.tool_use_prompt_token_count or 0
+            self.output_tokens = usage.candidates_token_count or 0
+            self.thoughts_tokens = usage.thoughts_token_count or 0
+            self.cache_hit = bool(usage.cached_content_token_count)
+
+        feedback = getattr(response, 'prompt_feedback', None)
+        if feedback and feedback.block_reason:
+            self.blocked = True
+
+        for candidate in getattr(response, 'candidates', None) or []:
+            reason = getattr(candidate.finish_reason, 'name', candidate.finish_reason)
+            if reason in BLOCKED_FINISH_REASONS:
+                self.blocked = True
+            grounding = getattr(candidate, 'grounding_metadata', None)
+            if grounding and (grounding.web_search_queries or grounding.grounding_chunks):
+                self.grounded = True
+        return response
+
+
+class track_call:
+    """
+    Context manager timing a Gemini call and recording it on exit.
+    No response (API error, timeout) or a blocked response counts as an error;
+    a response that never set `parsed` counts as a parse failure.
+    """
+
+    def __init__(self, mode, model, telemetry=None):
+        self.call = GeminiCall(mode, model)
+        self.telemetry = telemetry or TELEMETRY
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self.call
+
+    def __exit__(self, exc_type, exc, tb):
+        call = self.call
+        self.telemetry.record(
+            call.mode, call.model,
+            latency_ms=(time.perf_counter() - self._started) * 1000,
+            prompt_tokens=call.prompt_tokens,
+            output_tokens=call.output_tokens,
+            thoughts_tokens=call.thoughts_tokens,
+            tool_prompt_tokens=call.tool_prompt_tokens,
+            responded=call.responded,
+            error=not call.responded or call.blocked,
+            parsed=call.parsed and exc_type is None,
+            grounded=call.grounded,
+            cache_hit=call.cache_hit,
+        )
+        return False
+
+
+TELEMETRY = Telemetry()
+
+
+# --- LOG SUMMARY CLI ---
+
+def percentile(histogram, pct):
+    """Nearest-rank percentile over a {value: count} histogram."""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = max(1, -(-total * pct // 100))
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if seen >= rank:
+            return value
+
+
+def parse_log_lines(lines, namespace=NAMESPACE):
+    """
+    Merges EMF lines from a log file into per-mode histograms and totals.
+    Tolerates CloudWatch prefixes and unrelated log lines.
+    """
+    modes = {}
+    for line in lines:
+        start = line.find('{')
+        if start < 0:
+            continue
+        try:
+            record = json.loads(line[start:])
+        except ValueError:
+            continue
+        if not isinstance(record, dict):
+            continue
+
+        directives = record.get('_aws', {}).get('CloudWatchMetrics', [])
+        if not any(d.get('Namespace') == namespace for d in directives):
+            continue
+
+        histograms, totals = modes.setdefault(
+            record.get('Mode', 'unknown'), ({name: {} for name in DISTRIBUTIONS}, dict.fromkeys(COUNTERS, 0))
+        )
+        for name in DISTRIBUTIONS:
+            values = record.get(name, [])
+            for value in values if isinstance(values, list) else [values]:
+                histograms[name][value] = histograms[name].get(value, 0) + 1
+        for name in COUNTERS:
+            totals[name] += record.get(name, 0)
+    return modes
+
+
+def summarize(modes):
+    summary = {}
+    for mode, (histograms, totals) in sorted(modes.items()):
+        calls = totals['Calls']
+        if not calls:
+            continue
+
+        def total(*names):
+            return sum(value * count for name in names for value, count in histograms[name].items())
+
+        # Billing: tool-use prompt tokens are input, thinking tokens are output
+        input_tokens = total('PromptTokens', 'ToolPromptTokens')
+        output_tokens = total('OutputTokens', 'ThoughtsTokens')
+        summary[mode] = {
+            "calls": calls,
+            "latency_p50_ms": percentile(histograms['Latency'], 50),
+            "latency_p95_ms": percentile(histograms['Latency'], 95),
+            "input_tokens_per_request": round(input_tokens / calls, 1),
+            "output_tokens_per_request": round(output_tokens / calls, 1),
+            "tokens_per_request": round((input_tokens + output_tokens) / calls, 1),
+            "error_rate": round(totals['Errors'] / calls, 3),
+            "parse_failure_rate": round(totals['ParseFailures'] / calls, 3),
+            "grounded_rate": round(totals['GroundedCalls'] / calls, 3),
+            "cache_hit_rate": round(totals['CacheHits'] / calls, 3),
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize Gemini telemetry from an analyze log file.")
+    parser.add_argument('logfile', help="Log file with EMF lines ('-' for stdin)")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    if args.logfile == '-':
+        summary = summarize(parse_log_lines(sys.stdin))
+    else:
+        with open(args.logfile, 'r') as f:
+            summary = summarize(parse_log_lines(f))
+
+    if args.json:
+        print(json.dumps(summary, indent=4))
+        return summary
+
+    print(f"{'MODE':<14}{'CALLS':>7}{'P50 MS':>9}{'P95 MS':>9}{'IN/REQ':>10}{'OUT/REQ':>10}"
+          f"{'TOKENS/REQ':>12}{'ERRORS':>9}{'PARSE FAIL':>12}")
+    for mode, row in summary.items():
+        print(f"{mode:<14}{row['calls']:>7}{row['latency_p50_ms']:>9}{row['latency_p95_ms']:>9}"
+              f"{row['input_tokens_per_request']:>10}{row['output_tokens_per_request']:>10}"
+              f"{row['tokens_per_request']:>12}{row['error_rate']:>9.1%}{row['parse_failure_rate']:>12.1%}")
+    return summary
+
+
+if __name__ == '__main__':
+    main()
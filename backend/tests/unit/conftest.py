@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The analyze function imports its helpers as top-level `services.*` (Lambda CodeUri root)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'analyze'))
@@ -0,0 +1,153 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from analyze import app
+
+
+CTX = {"name": "The Matrix", "year": "1999", "search_context": "Movie", "genres_str": "Action"}
+
+
+def analyze_event(**params):
+    return {"queryStringParameters": params}
+
+
+def body(response):
+    return json.loads(response["body"])
+
+
+@pytest.fixture()
+def stubs(monkeypatch):
+    """ Replaces TMDB and Gemini so jobs run offline """
+    monkeypatch.setattr(app, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(app, "genai", SimpleNamespace(Client=lambda api_key: object()))
+    monkeypatch.setattr(app, "fetch_tmdb_context", lambda movie_id, title, media_type: CTX)
+    monkeypatch.setattr(app, "analyze_synopsis", lambda client, ctx, season, safety: {"full_plot": season or "plot"})
+    monkeypatch.setattr(app, "analyze_composition", lambda client, ctx, safety: {"emotional": {"thrill": 90}})
+
+
+@pytest.fixture()
+def backend(monkeypatch, tmp_path, stubs):
+    monkeypatch.setenv("JOB_BACKEND", "sqlite")
+    monkeypatch.setenv("JOB_STORE_PATH", str(tmp_path / "jobs.db"))
+    app.get_job_backend.cache_clear()
+    yield app.get_job_backend()
+    app.get_job_backend.cache_clear()
+
+
+@pytest.fixture()
+def no_backend(monkeypatch):
+    monkeypatch.delenv("JOB_BACKEND", raising=False)
+    app.get_job_backend.cache_clear()
+    yield
+    app.get_job_backend.cache_clear()
+
+
+def test_async_mode_is_off_without_backend(no_backend):
+    submit = app.lambda_handler(analyze_event(id="603", mode="synopsis", **{"async": "1"}), None)
+    poll = app.lambda_handler(analyze_event(job="abc"), None)
+
+    assert submit["statusCode"] == 400
+    assert poll["statusCode"] == 400
+    assert body(submit)["error"] == "Async mode not enabled"
+
+
+def test_submit_rejects_score_mode(backend):
+    ret = app.lambda_handler(analyze_event(id="603", mode="score", **{"async": "true"}), None)
+
+    assert ret["statusCode"] == 400
+
+
+def test_submit_requires_subject(backend):
+    ret = app.lambda_handler(analyze_event(mode="synopsis", **{"async": "1"}), None)
+
+    assert ret["statusCode"] == 400
+    assert body(ret)["error"] == "Please provide a title or id"
+
+
+def test_submit_returns_job_and_deduplicates(backend, monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(backend.queue, "enqueue", enqueued.append)
+    event = analyze_event(id="603", mode="composition", **{"async": "1"})
+
+    first = app.lambda_handler(event, None)
+    second = app.lambda_handler(event, None)
+
+    assert first["statusCode"] == 202
+    assert body(first)["status"] == "pending"
+    assert body(first)["job_id"] == body(second)["job_id"]
+    assert len(enqueued) == 1
+
+
+def test_poll_waits_for_result(backend):
+    submitted = app.lambda_handler(analyze_event(id="603", mode="synopsis", season="Season 2", **{"async": "1"}), None)
+
+    ret = app.lambda_handler(analyze_event(job=body(submitted)["job_id"], wait="5"), None)
+
+    assert ret["statusCode"] == 200
+    assert body(ret)["status"] == "done"
+    assert body(ret)["result"] == {"full_plot": "Season 2"}
+
+
+def test_poll_reports_job_errors(backend, monkeypatch):
+    monkeypatch.setattr(app, "fetch_tmdb_context", lambda movie_id, title, media_type: None)
+    submitted = app.lambda_handler(analyze_event(title="Nothing", mode="synopsis", **{"async": "1"}), None)
+
+    ret = app.lambda_handler(analyze_event(job=body(submitted)["job_id"], wait="5"), None)
+
+    assert body(ret)["status"] == "failed"
+    assert body(ret)["error"] == "Subject not found"
+    assert "result" not in body(ret)
+
+
+def test_poll_unknown_job(backend):
+    ret = app.lambda_handler(analyze_event(job="missing"), None)
+
+    assert ret["statusCode"] == 404
+
+
+@pytest.mark.parametrize("wait, expected", [("999", app.MAX_WAIT_SECONDS), ("-3", 0), ("abc", 0), (None, 0), ("2.5", 2.5)])
+def test_poll_clamps_wait(backend, monkeypatch, wait, expected):
+    seen = []
+    monkeypatch.setattr(app, "wait_for_job", lambda store, job_id, timeout: seen.append(timeout))
+
+    app.poll_job("missing", wait)
+
+    assert seen == [expected]
+
+
+def test_sqs_records_run_jobs(backend):
+    job, _ = backend.store.submit({"id": "603", "title": None, "type": "movie", "mode": "composition", "season": None})
+
+    app.lambda_handler({"Records": [{"body": json.dumps({"job_id": job["job_id"]})}]}, None)
+
+    assert backend.store.get(job["job_id"])["result"] == {"emotional": {"thrill": 90}}
+
+
+def test_sqs_records_skip_bad_messages(backend):
+    job, _ = backend.store.submit({"id": "603", "title": None, "type": "movie", "mode": "composition", "season": None})
+    records = [{"body": "not json"}, {"body": json.dumps({"id": "603"})}, {"body": json.dumps({"job_id": job["job_id"]})}]
+
+    assert app.lambda_handler({"Records": records}, None) == {}
+    assert backend.store.get(job["job_id"])["status"] == "done"
+
+
+def test_sqs_records_without_backend(no_backend):
+    event = {"Records": [{"body": json.dumps({"job_id": "abc"})}]}
+
+    assert app.lambda_handler(event, None) == {}
+
+
+def test_run_job_requires_subject(stubs, monkeypatch):
+    monkeypatch.setattr(app, "fetch_tmdb_context", lambda movie_id, title, media_type: None)
+
+    with pytest.raises(ValueError, match="Subject not found"):
+        app.run_job({"id": "0", "title": None, "type": "movie", "mode": "synopsis", "season": None})
+
+
+def test_run_job_requires_api_key(stubs, monkeypatch):
+    monkeypatch.setattr(app, "GEMINI_API_KEY", None)
+
+    with pytest.raises(RuntimeError, match="Server Configuration Error"):
+        app.run_job({"id": "603", "title": None, "type": "movie", "mode": "composition", "season": None})
@@ -0,0 +1,255 @@
+import json
+import sqlite3
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from services.jobs import (
+    DynamoDBJobStore, JobStore, SQLiteJobStore, SQSJobQueue, ThreadJobQueue,
+    load_job_backend, process_job, wait_for_job,
+)
+
+
+@pytest.fixture()
+def params():
+    return {"id": "603", "title": None, "type": "movie", "mode": "synopsis", "season": None}
+
+
+def test_submit_deduplicates_pending_jobs(params):
+    store = SQLiteJobStore()
+
+    first, created = store.submit(params)
+    second, created_again = store.submit(dict(params))
+
+    assert created
+    assert not created_again
+    assert first["job_id"] == second["job_id"]
+    assert first["status"] == "pending"
+
+
+def test_finished_job_is_not_reused(params):
+    store = SQLiteJobStore()
+    first, _ = store.submit(params)
+    store.complete(first["job_id"], {"full_plot": "..."})
+
+    second, created = store.submit(params)
+
+    assert created
+    assert second["job_id"] != first["job_id"]
+
+
+def test_queue_runs_job_and_stores_result(params):
+    store = SQLiteJobStore()
+    queue = ThreadJobQueue(store, lambda p: {"mode": p["mode"]})
+    job, _ = store.submit(params)
+
+    queue.enqueue(job).join()
+    done = wait_for_job(store, job["job_id"])
+
+    assert done["status"] == "done"
+    assert done["result"] == {"mode": "synopsis"}
+
+
+def test_queue_records_failures(params):
+    def runner(p):
+        raise ValueError("Subject not found")
+
+    store = SQLiteJobStore()
+    job, _ = store.submit(params)
+
+    ThreadJobQueue(store, runner).enqueue(job).join()
+    failed = store.get(job["job_id"])
+
+    assert failed["status"] == "failed"
+    assert failed["error"] == "Subject not found"
+
+
+def test_wait_for_unknown_job_returns_none():
+    assert wait_for_job(SQLiteJobStore(), "missing", timeout=0) is None
+
+
+def test_stale_active_job_is_replaced(params, tmp_path):
+    path = str(tmp_path / "jobs.db")
+    dead, _ = SQLiteJobStore(path).submit(params)
+
+    # New process, same file: the worker that owned `dead` is gone
+    store = SQLiteJobStore(path, stale_after=-1)
+    assert store.claim(dead["job_id"])
+    job, created = store.submit(params)
+
+    assert created
+    assert job["job_id"] != dead["job_id"]
+    assert store.get(dead["job_id"])["status"] == "failed"
+    assert store.get(dead["job_id"])["error"] == "Job expired"
+
+
+def test_live_job_is_not_expired(params):
+    store = SQLiteJobStore(stale_after=3600)
+    job, _ = store.submit(params)
+    assert store.claim(job["job_id"])
+
+    assert store.get(job["job_id"])["status"] == "running"
+    assert not store.submit(params)[1]
+
+
+def test_process_job_skips_finished_jobs(params):
+    calls = []
+    store = SQLiteJobStore()
+    job, _ = store.submit(params)
+    store.complete(job["job_id"], {"full_plot": "..."})
+
+    process_job(store, calls.append, job["job_id"])
+
+    assert calls == []
+
+
+def test_job_store_interface_is_abstract():
+    class HalfStore(JobStore):
+        def submit(self, params):
+            return None, False
+
+    with pytest.raises(TypeError):
+        HalfStore()
+
+
+def test_load_job_backend_is_off_by_default():
+    assert load_job_backend(lambda p: p, environ={}) is None
+
+
+def test_load_job_backend_sqlite(tmp_path):
+    backend = load_job_backend(lambda p: p, environ={
+        "JOB_BACKEND": "sqlite", "JOB_STORE_PATH": str(tmp_path / "jobs.db"), "JOB_STALE_SECONDS": "60"
+    })
+
+    assert isinstance(backend.store, SQLiteJobStore)
+    assert isinstance(backend.queue, ThreadJobQueue)
+    assert backend.store.stale_after == 60
+
+
+def test_load_job_backend_rejects_bad_config():
+    with pytest.raises(ValueError):
+        load_job_backend(lambda p: p, environ={"JOB_BACKEND": "dynamodb"})
+    with pytest.raises(ValueError):
+        load_job_backend(lambda p: p, environ={"JOB_BACKEND": "redis"})
+
+
+@pytest.fixture()
+def aws(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        boto3.client("dynamodb").create_table(
+            TableName="jobs",
+            AttributeDefinitions=[{"AttributeName": "pk", "AttributeType": "S"}],
+            KeySchema=[{"AttributeName": "pk", "KeyType": "HASH"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        queue_url = boto3.client("sqs").create_queue(QueueName="jobs")["QueueUrl"]
+        yield queue_url
+
+
+def test_dynamodb_store_deduplicates_and_completes(aws, params):
+    store = DynamoDBJobStore("jobs")
+
+    first, created = store.submit(params)
+    second, created_again = store.submit(params)
+    store.complete(first["job_id"], {"full_plot": "..."})
+    third, created_third = store.submit(params)
+
+    assert created and not created_again and created_third
+    assert first["job_id"] == second["job_id"] != third["job_id"]
+    assert store.get(first["job_id"])["result"] == {"full_plot": "..."}
+
+
+def test_dynamodb_store_replaces_stale_job(aws, params):
+    dead, _ = DynamoDBJobStore("jobs").submit(params)
+
+    store = DynamoDBJobStore("jobs", stale_after=-1)
+    job, created = store.submit(params)
+
+    assert created
+    assert job["job_id"] != dead["job_id"]
+    assert store.get(dead["job_id"])["error"] == "Job expired"
+
+
+def test_sqs_queue_sends_job_id(aws, params):
+    store = DynamoDBJobStore("jobs")
+    job, _ = store.submit(params)
+
+    SQSJobQueue(aws).enqueue(job)
+    messages = boto3.client("sqs").receive_message(QueueUrl=aws)["Messages"]
+
+    assert json.loads(messages[0]["Body"]) == {"job_id": job["job_id"]}
+
+
+def test_claim_is_exclusive(params):
+    store = SQLiteJobStore()
+    job, _ = store.submit(params)
+
+    assert store.claim(job["job_id"])
+    assert not store.claim(job["job_id"])
+    assert store.get(job["job_id"])["attempts"] == 1
+
+
+def test_duplicate_delivery_runs_job_once(params):
+    calls = []
+    store = SQLiteJobStore()
+    job, _ = store.submit(params)
+    assert store.claim(job["job_id"])
+
+    # A second delivery while the first worker still holds the job
+    process_job(store, calls.append, job["job_id"])
+
+    assert calls == []
+    assert store.get(job["job_id"])["status"] == "running"
+
+
+def test_killed_worker_is_retried_then_expired(params):
+    calls = []
+    store = SQLiteJobStore(lease=-1, max_attempts=2)
+    job, _ = store.submit(params)
+
+    # Two deliveries whose workers die mid-run (claimed, never completed)
+    assert store.claim(job["job_id"])
+    assert store.claim(job["job_id"])
+    assert store.get(job["job_id"])["attempts"] == 2
+
+    # Third delivery: out of attempts, the job is failed instead of re-run
+    finished = process_job(store, calls.append, job["job_id"])
+
+    assert calls == []
+    assert finished["status"] == "failed"
+    assert finished["error"] == "Job expired"
+
+
+def test_sqlite_store_adds_attempts_column(params, tmp_path):
+    path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, job_key TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL,"
+        " result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.commit()
+    conn.close()
+
+    store = SQLiteJobStore(path)
+    job, _ = store.submit(params)
+
+    assert store.claim(job["job_id"])
+
+
+def test_dynamodb_claim_is_exclusive_and_limited(aws, params):
+    store = DynamoDBJobStore("jobs", lease=-1, max_attempts=2)
+    job, _ = store.submit(params)
+
+    assert store.claim(job["job_id"])
+    assert store.claim(job["job_id"])
+    assert not store.claim(job["job_id"])
+    assert not store.claim("missing")
+
+    live = DynamoDBJobStore("jobs", lease=3600)
+    other, _ = live.submit({**params, "id": "604"})
+    assert live.claim(other["job_id"])
+    assert not live.claim(other["job_id"])
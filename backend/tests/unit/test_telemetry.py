@@ -0,0 +1,269 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+
+from analyze import app
+from services import telemetry
+from services.composition import analyze_composition
+from services.score import analyze_score
+from services.synopsis import analyze_synopsis
+from services.telemetry import Telemetry, track_call, parse_log_lines, summarize, percentile, main
+
+
+CTX = {"name": "The Matrix", "year": "1999", "search_context": "Movie", "genres_str": "Action"}
+
+
+def gemini_response(text='{"popcorn_score": "95%"}', finish_reason="STOP", grounded=True, block_reason=None):
+    """ Real google-genai response object, as returned by generate_content """
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(
+            content=types.Content(parts=[types.Part(text=text)]) if text else None,
+            finish_reason=finish_reason,
+            grounding_metadata=types.GroundingMetadata(web_search_queries=["popcornmeter"]) if grounded else None,
+        )],
+        prompt_feedback=types.GenerateContentResponsePromptFeedback(block_reason=block_reason) if block_reason else None,
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=120,
+            tool_use_prompt_token_count=300,
+            candidates_token_count=30,
+            thoughts_token_count=500,
+        ),
+    )
+
+
+def stub_client(result):
+    """ client.models.generate_content returning `result` (or raising it) """
+    def generate_content(model, contents, config):
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+
+
+@pytest.fixture()
+def emitted(monkeypatch):
+    """ Captures lines flushed from the shared TELEMETRY instance """
+    lines = []
+    telemetry.TELEMETRY.flush()
+    monkeypatch.setattr(telemetry.TELEMETRY, "emit", lines.append)
+    return lines
+
+
+def flushed(lines):
+    telemetry.TELEMETRY.flush()
+    return [json.loads(line) for line in lines]
+
+
+def test_track_call_flushes_emf_line():
+    lines = []
+    sink = Telemetry(emit=lines.append)
+
+    with track_call('score', 'gemini-2.5-flash', sink) as call:
+        call.observe(gemini_response())
+        call.parsed = True
+    sink.flush()
+
+    record = json.loads(lines[0])
+    assert record["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Mode"]]
+    assert record["Mode"] == "score"
+    assert record["Model"] == "gemini-2.5-flash"
+    assert record["PromptTokens"] == [120]
+    assert record["ToolPromptTokens"] == [300]
+    assert record["OutputTokens"] == [30]
+    assert record["ThoughtsTokens"] == [500]
+    assert record["Calls"] == 1
+    assert record["Errors"] == 0
+    assert record["ParseFailures"] == 0
+    assert record["GroundedCalls"] == 1
+    assert record["CacheHits"] == 0
+
+    sink.flush()
+    assert len(lines) == 1
+
+
+def test_metric_members_are_numbers_or_number_arrays():
+    lines = []
+    sink = Telemetry(emit=lines.append)
+    for latency in range(250):
+        sink.record('composition', 'gemini-2.5-flash', latency, parsed=True)
+    sink.flush()
+
+    records = [json.loads(line) for line in lines]
+    assert len(records) == 3
+    for record in records:
+        for metric in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]:
+            value = record[metric["Name"]]
+            if isinstance(value, list):
+                assert len(value) <= 100
+                assert all(isinstance(v, (int, float)) for v in value)
+            else:
+                assert isinstance(value, (int, float))
+    assert sum(len(r["Latency"]) for r in records) == 250
+    assert records[0]["Calls"] == 250
+
+
+def test_continuation_lines_carry_no_counters():
+    lines = []
+    sink = Telemetry(emit=lines.append)
+    for latency in range(150):
+        sink.record('composition', 'gemini-2.5-flash', latency, parsed=True)
+    sink.flush()
+
+    first, rest = [json.loads(line) for line in lines]
+    declared = {m["Name"] for m in rest["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    assert first["Calls"] == 150
+    assert len(rest["Latency"]) == 50
+    assert not declared & {"Calls", "Errors", "ParseFailures", "GroundedCalls", "CacheHits"}
+    assert "Calls" not in rest
+
+
+def test_errored_call_adds_no_token_values():
+    lines = []
+    sink = Telemetry(emit=lines.append)
+    sink.record('score', 'gemini-2.5-flash', 100, prompt_tokens=120, parsed=True)
+    sink.record('score', 'gemini-2.5-flash', 5000, responded=False, error=True)
+    sink.flush()
+
+    record = json.loads(lines[0])
+    assert record["Latency"] == [100, 5000]
+    assert record["PromptTokens"] == [120]
+    assert 0 not in record["PromptTokens"]
+
+
+def test_api_error_is_not_a_parse_failure():
+    lines = []
+    sink = Telemetry(emit=lines.append)
+
+    with pytest.raises(TimeoutError):
+        with track_call('synopsis', 'gemini-2.5-flash', sink) as call:
+            call.observe(stub_client(TimeoutError("deadline")).models.generate_content(None, None, None))
+    sink.flush()
+
+    record = json.loads(lines[0])
+    assert record["Errors"] == 1
+    assert record["ParseFailures"] == 0
+    assert "PromptTokens" not in record
+    assert "PromptTokens" not in {m["Name"] for m in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+
+
+def test_bad_json_is_a_parse_failure():
+    lines = []
+    sink = Telemetry(emit=lines.append)
+
+    with pytest.raises(ValueError):
+        with track_call('synopsis', 'gemini-2.5-flash', sink) as call:
+            json.loads(call.observe(gemini_response(text="not json")).text)
+    sink.flush()
+
+    record = json.loads(lines[0])
+    assert record["Errors"] == 0
+    assert record["ParseFailures"] == 1
+
+
+@pytest.mark.parametrize("service, mode", [
+    (lambda client: analyze_score(client, CTX, []), "score"),
+    (lambda client: analyze_composition(client, CTX, []), "composition"),
+    (lambda client: analyze_synopsis(client, CTX, None, []), "synopsis"),
+])
+def test_services_record_their_mode(emitted, service, mode):
+    service(stub_client(gemini_response(text='{"ok": 1}')))
+
+    [record] = flushed(emitted)
+    assert record["Mode"] == mode
+    assert record["Calls"] == 1
+    assert record["ParseFailures"] == 0
+    assert record["Errors"] == 0
+
+
+def test_service_records_parse_failure(emitted):
+    data = analyze_composition(stub_client(gemini_response(text="I cannot rate this film")), CTX, [])
+
+    [record] = flushed(emitted)
+    assert data == {}
+    assert record["ParseFailures"] == 1
+    assert record["Errors"] == 0
+
+
+def test_service_records_api_error(emitted):
+    data = analyze_score(stub_client(RuntimeError("503 UNAVAILABLE")), CTX, [])
+
+    [record] = flushed(emitted)
+    assert data == {"popcorn_score": "N/A"}
+    assert record["Errors"] == 1
+    assert record["ParseFailures"] == 0
+
+
+def test_service_records_blocked_response_as_error(emitted):
+    analyze_synopsis(stub_client(gemini_response(text=None, finish_reason="SAFETY", block_reason="SAFETY")), CTX, None, [])
+
+    [record] = flushed(emitted)
+    assert record["Errors"] == 1
+    assert record["ParseFailures"] == 0
+
+
+def test_lambda_handler_flushes_telemetry(emitted, monkeypatch):
+    monkeypatch.setattr(app, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(app, "fetch_tmdb_context", lambda movie_id, title, media_type: CTX)
+    monkeypatch.setattr(app, "genai", SimpleNamespace(
+        Client=lambda api_key: stub_client(gemini_response(text='{"emotional": {"thrill": 90}}'))
+    ))
+
+    ret = app.lambda_handler({"queryStringParameters": {"id": "603", "mode": "composition"}}, None)
+
+    assert ret["statusCode"] == 200
+    [record] = [json.loads(line) for line in emitted]
+    assert record["Mode"] == "composition"
+
+
+def write_log(path, calls):
+    lines = []
+    sink = Telemetry(emit=lines.append)
+    for latency, parsed in calls:
+        sink.record('composition', 'gemini-2.5-flash', latency, prompt_tokens=100, output_tokens=50,
+                    thoughts_tokens=200, tool_prompt_tokens=10, parsed=parsed)
+    sink.record('score', 'gemini-2.5-flash', 900, responded=False, error=True)
+    sink.flush()
+    path.write_text("START RequestId: abc\n" + "".join(f"2024-01-01T00:00:00Z\t{line}\n" for line in lines) + "not json {\n")
+    return path
+
+
+def test_summarize_log_file(tmp_path):
+    log = write_log(tmp_path / "mel.log", [(latency, latency != 1) for latency in range(1, 151)])
+    with open(log) as f:
+        summary = summarize(parse_log_lines(f))
+
+    assert summary["composition"]["calls"] == 150
+    assert summary["composition"]["latency_p50_ms"] == 75
+    assert summary["composition"]["latency_p95_ms"] == 143
+    assert summary["composition"]["input_tokens_per_request"] == 110
+    assert summary["composition"]["output_tokens_per_request"] == 250
+    assert summary["composition"]["tokens_per_request"] == 360
+    assert summary["composition"]["parse_failure_rate"] == round(1 / 150, 3)
+    assert summary["score"]["error_rate"] == 1
+    assert summary["score"]["parse_failure_rate"] == 0
+
+
+def test_cli_prints_table(tmp_path, capsys):
+    log = write_log(tmp_path / "mel.log", [(100, True), (300, False)])
+
+    main([str(log)])
+    header, composition, score = capsys.readouterr().out.splitlines()
+
+    assert header.split() == ["MODE", "CALLS", "P50", "MS", "P95", "MS", "IN/REQ", "OUT/REQ",
+                              "TOKENS/REQ", "ERRORS", "PARSE", "FAIL"]
+    assert composition.split() == ["composition", "2", "100", "300", "110.0", "250.0", "360.0", "0.0%", "50.0%"]
+    assert score.split() == ["score", "1", "900", "900", "0.0", "0.0", "0.0", "100.0%", "0.0%"]
+
+
+def test_cli_json_and_empty_log(tmp_path, capsys):
+    empty = tmp_path / "empty.log"
+    empty.write_text("")
+
+    assert main([str(empty), "--json"]) == {}
+    assert json.loads(capsys.readouterr().out) == {}
+
+
+def test_percentile_empty_histogram():
+    assert percentile({}, 95) is None